@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import RepositoryAnalysis, ExportFile
+from .models import RepositoryAnalysis, ExportFile, GeminiCache
 
 
 @admin.register(RepositoryAnalysis)
@@ -7,7 +7,7 @@ class RepositoryAnalysisAdmin(admin.ModelAdmin):
     list_display = ['repository_name', 'owner', 'status', 'stars', 'forks', 'created_at']
     list_filter = ['status', 'language', 'created_at']
     search_fields = ['repository_name', 'owner', 'repository_url']
-    readonly_fields = ['id', 'created_at', 'updated_at']
+    readonly_fields = ['id', 'file_structure', 'created_at', 'updated_at']
     
     fieldsets = (
         ('Repository Information', {
@@ -33,6 +33,15 @@ class RepositoryAnalysisAdmin(admin.ModelAdmin):
 @admin.register(ExportFile)
 class ExportFileAdmin(admin.ModelAdmin):
     list_display = ['analysis', 'format', 'file_size', 'created_at']
+    list_select_related = ['analysis']
     list_filter = ['format', 'created_at']
     search_fields = ['analysis__repository_name', 'analysis__owner']
-    readonly_fields = ['id', 'created_at']
\ No newline at end of file
+    readonly_fields = ['id', 'created_at']
+
+
+@admin.register(GeminiCache)
+class GeminiCacheAdmin(admin.ModelAdmin):
+    list_display = ['prompt_hash', 'model_name', 'created_at']
+    list_filter = ['model_name', 'created_at']
+    search_fields = ['prompt_hash']
+    readonly_fields = ['prompt_hash', 'model_name', 'response', 'created_at']
\ No newline at end of file
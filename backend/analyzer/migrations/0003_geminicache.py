@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0002_alter_repositoryanalysis_description_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeminiCache',
+            fields=[
+                ('prompt_hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('model_name', models.CharField(max_length=100)),
+                ('response', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Gemini Cache Entry',
+                'verbose_name_plural': 'Gemini Cache Entries',
+            },
+        ),
+    ]
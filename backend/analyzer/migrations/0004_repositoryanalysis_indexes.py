@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0003_geminicache'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='repositoryanalysis',
+            index=models.Index(fields=['-created_at'], name='analysis_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repositoryanalysis',
+            index=models.Index(fields=['status', '-created_at'], name='analysis_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repositoryanalysis',
+            index=models.Index(fields=['repository_url'], name='analysis_url_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:30
+
+import json
+
+from django.db import migrations, models
+import zstandard
+
+
+def compress_file_structure(apps, schema_editor):
+    RepositoryAnalysis = apps.get_model('analyzer', 'RepositoryAnalysis')
+    compressor = zstandard.ZstdCompressor(level=10)
+    for analysis in RepositoryAnalysis.objects.only('id', 'file_structure').iterator():
+        analysis.file_structure_zst = compressor.compress(
+            json.dumps(analysis.file_structure or {}).encode('utf-8')
+        )
+        analysis.save(update_fields=['file_structure_zst'])
+
+
+def decompress_file_structure(apps, schema_editor):
+    RepositoryAnalysis = apps.get_model('analyzer', 'RepositoryAnalysis')
+    decompressor = zstandard.ZstdDecompressor()
+    for analysis in RepositoryAnalysis.objects.only('id', 'file_structure_zst').iterator():
+        if analysis.file_structure_zst is None:
+            continue
+        analysis.file_structure = json.loads(decompressor.decompress(bytes(analysis.file_structure_zst)))
+        analysis.save(update_fields=['file_structure'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0004_repositoryanalysis_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repositoryanalysis',
+            name='file_structure_zst',
+            field=models.BinaryField(editable=False, null=True),
+        ),
+        migrations.RunPython(compress_file_structure, decompress_file_structure),
+        migrations.RemoveField(
+            model_name='repositoryanalysis',
+            name='file_structure',
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:22
+
+from django.db import migrations, models
+
+
+def fail_duplicate_in_progress(apps, schema_editor):
+    """Keep only the newest in-progress analysis per URL so the constraint can be added"""
+    RepositoryAnalysis = apps.get_model('analyzer', 'RepositoryAnalysis')
+    seen = set()
+    in_progress = RepositoryAnalysis.objects.filter(
+        status__in=['pending', 'analyzing']
+    ).order_by('-created_at').values_list('id', 'repository_url')
+    duplicates = []
+    for analysis_id, repository_url in in_progress:
+        if repository_url in seen:
+            duplicates.append(analysis_id)
+        seen.add(repository_url)
+    RepositoryAnalysis.objects.filter(id__in=duplicates).update(
+        status='failed', error_message='Analysis failed: superseded by a newer request'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0005_compress_file_structure'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_in_progress, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='repositoryanalysis',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'analyzing'])), fields=('repository_url',), name='analysis_unique_in_progress_url'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0006_unique_in_progress_analysis'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportfile',
+            name='compressed',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0007_exportfile_compressed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='repositoryanalysis',
+            index=models.Index(condition=models.Q(('status', 'completed')), fields=['repository_url', '-created_at'], name='analysis_url_completed_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0008_completed_url_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repositoryanalysis',
+            name='tree_sha',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+    ]
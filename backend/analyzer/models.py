@@ -1,5 +1,17 @@
 from django.db import models
+import orjson
 import uuid
+import zstandard
+
+
+def compress_json(data) -> bytes:
+    """Serialize data to JSON and compress it with zstd"""
+    return zstandard.ZstdCompressor(level=10).compress(orjson.dumps(data))
+
+
+def decompress_json(blob):
+    """Inverse of compress_json"""
+    return orjson.loads(zstandard.ZstdDecompressor().decompress(bytes(blob)))
 
 
 class RepositoryAnalysis(models.Model):
@@ -13,7 +25,8 @@ class RepositoryAnalysis(models.Model):
     # Analysis results
     summary = models.TextField()
     tech_stack = models.JSONField(default=dict)
-    file_structure = models.JSONField(default=dict)
+    # File tree is stored zstd-compressed; use the file_structure property
+    file_structure_zst = models.BinaryField(null=True, editable=False)
     setup_instructions = models.TextField()
     
     # Metadata
@@ -21,6 +34,8 @@ class RepositoryAnalysis(models.Model):
     forks = models.IntegerField(default=0)
     language = models.CharField(max_length=50, blank=True, default='')
     description = models.TextField(blank=True, null=True, default='')
+    # Git tree SHA of the analyzed revision; identical trees mean identical content
+    tree_sha = models.CharField(max_length=40, blank=True, default='')
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -40,9 +55,44 @@ class RepositoryAnalysis(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Repository Analysis'
         verbose_name_plural = 'Repository Analyses'
+        indexes = [
+            models.Index(fields=['-created_at'], name='analysis_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='analysis_status_created_idx'),
+            models.Index(fields=['repository_url'], name='analysis_url_idx'),
+            # Latest completed analysis for a URL (get_analysis_by_url)
+            models.Index(
+                fields=['repository_url', '-created_at'],
+                condition=models.Q(status='completed'),
+                name='analysis_url_completed_idx',
+            ),
+        ]
+        constraints = [
+            # At most one queued/running analysis per repository
+            models.UniqueConstraint(
+                fields=['repository_url'],
+                condition=models.Q(status__in=['pending', 'analyzing']),
+                name='analysis_unique_in_progress_url',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.repository_name} - {self.status}"
+    
+    @property
+    def file_structure(self) -> dict:
+        """Decompressed file structure (cached per loaded blob)"""
+        blob = self.file_structure_zst
+        if blob is None:
+            return {}
+        cached = self.__dict__.get('_file_structure_cache')
+        if cached is None or cached[0] is not blob:
+            cached = (blob, decompress_json(blob))
+            self.__dict__['_file_structure_cache'] = cached
+        return cached[1]
+    
+    @file_structure.setter
+    def file_structure(self, value: dict):
+        self.file_structure_zst = compress_json(value or {})
 
 
 class ExportFile(models.Model):
@@ -60,6 +110,8 @@ class ExportFile(models.Model):
     format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
     file_path = models.CharField(max_length=500)
     file_size = models.IntegerField(default=0)
+    # Stored zstd-compressed on disk (file_size is the uncompressed size)
+    compressed = models.BooleanField(default=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -68,4 +120,21 @@ class ExportFile(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.analysis.repository_name} - {self.format.upper()}"
\ No newline at end of file
+        return f"{self.analysis.repository_name} - {self.format.upper()}"
+
+
+class GeminiCache(models.Model):
+    """Model to cache Gemini responses keyed by model and prompt hash"""
+    
+    prompt_hash = models.CharField(max_length=64, primary_key=True)
+    model_name = models.CharField(max_length=100)
+    response = models.TextField()
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Gemini Cache Entry'
+        verbose_name_plural = 'Gemini Cache Entries'
+    
+    def __str__(self):
+        return f"{self.model_name} - {self.prompt_hash[:12]}"
@@ -0,0 +1,31 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSON renderer backed by orjson for faster response encoding"""
+    
+    # Fallback for types orjson doesn't handle natively (lazy strings, Decimal, ...)
+    _default = staticmethod(JSONEncoder().default)
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render data into UTF-8 encoded JSON bytes
+        
+        Args:
+            data: Response data
+            accepted_media_type: Negotiated media type
+            renderer_context: Renderer context from the view
+            
+        Returns:
+            JSON bytes
+        """
+        if data is None:
+            return b''
+        
+        return orjson.dumps(
+            data,
+            default=self._default,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        )
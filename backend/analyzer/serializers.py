@@ -1,7 +1,12 @@
 from rest_framework import serializers
+import re
 from .models import RepositoryAnalysis, ExportFile
 
 
+# Same shape GitHubService.parse_github_url accepts, checked after normalization
+_GITHUB_REPO_URL_RE = re.compile(r'https?://github\.com/[^/]+/[^/]+')
+
+
 class RepositoryAnalysisSerializer(serializers.ModelSerializer):
     """Serializer for Repository Analysis"""
     
@@ -20,6 +25,19 @@ class RepositoryAnalysisSerializer(serializers.ModelSerializer):
         ]
 
 
+class RepositoryAnalysisListSerializer(serializers.ModelSerializer):
+    """Lightweight serializer for analysis listings (omits large result fields)"""
+    
+    class Meta:
+        model = RepositoryAnalysis
+        fields = [
+            'id', 'repository_url', 'repository_name', 'owner', 'tech_stack',
+            'stars', 'forks', 'language', 'description',
+            'status', 'error_message', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
 class AnalyzeRepositorySerializer(serializers.Serializer):
     """Serializer for repository analysis request"""
     
@@ -29,7 +47,12 @@ class AnalyzeRepositorySerializer(serializers.Serializer):
     
     def validate_repository_url(self, value):
         """Validate that the URL is a GitHub repository"""
-        if 'github.com' not in value.lower():
+        # Normalize so equivalent URLs share the same stored analysis
+        value = value.strip().rstrip('/')
+        if value.endswith('.git'):
+            value = value[:-4]
+        
+        if not _GITHUB_REPO_URL_RE.fullmatch(value):
             raise serializers.ValidationError(
                 "Please provide a valid GitHub repository URL"
             )
@@ -48,8 +71,9 @@ class ExportFileSerializer(serializers.ModelSerializer):
     def get_download_url(self, obj):
         """Generate download URL for the export file"""
         request = self.context.get('request')
+        # Use the FK column directly to avoid loading the analysis per row
         if request:
             return request.build_absolute_uri(
-                f'/api/download/{obj.format}/{obj.analysis.id}/'
+                f'/api/download/{obj.format}/{obj.analysis_id}/'
             )
-        return f'/api/download/{obj.format}/{obj.analysis.id}/'
\ No newline at end of file
+        return f'/api/download/{obj.format}/{obj.analysis_id}/'
\ No newline at end of file
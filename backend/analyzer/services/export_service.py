@@ -11,10 +11,16 @@ from reportlab.lib import colors
 from docx import Document
 from docx.shared import Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+import threading
 import uuid
+import zstandard
 from ..models import RepositoryAnalysis, ExportFile
 
 
+# Plain-text exports compress well and are stored zstd-compressed on disk
+COMPRESSED_FORMATS = frozenset({'md', 'txt'})
+
+
 class ExportService:
     """Service for exporting repository analysis to various formats"""
     
@@ -35,6 +41,9 @@ class ExportService:
         """
         # Generate filename
         filename = f"{analysis.repository_name}_{analysis.owner}_{format_type}_{uuid.uuid4().hex[:8]}.{format_type}"
+        compressed = format_type in COMPRESSED_FORMATS
+        if compressed:
+            filename += '.zst'
         file_path = os.path.join(self.export_dir, filename)
         
         # Export based on format
@@ -49,8 +58,15 @@ class ExportService:
         else:
             raise ValueError(f"Unsupported format: {format_type}")
         
-        # Get file size
-        file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+        # Get file size (of the document itself, not the compressed file)
+        if not os.path.exists(file_path):
+            file_size = 0
+        elif compressed:
+            with open(file_path, 'rb') as f:
+                # A zstd frame header is at most 18 bytes and records the content size
+                file_size = zstandard.frame_content_size(f.read(18))
+        else:
+            file_size = os.path.getsize(file_path)
         
         # Create or update export record
         export_file, created = ExportFile.objects.get_or_create(
@@ -58,7 +74,8 @@ class ExportService:
             format=format_type,
             defaults={
                 'file_path': filename,  # Store relative path
-                'file_size': file_size
+                'file_size': file_size,
+                'compressed': compressed
             }
         )
         
@@ -66,7 +83,8 @@ class ExportService:
             # Update existing record
             export_file.file_path = filename
             export_file.file_size = file_size
-            export_file.save()
+            export_file.compressed = compressed
+            export_file.save(update_fields=['file_path', 'file_size', 'compressed'])
         
         return export_file
     
@@ -113,8 +131,7 @@ class ExportService:
 *Generated by Repo Insight Generator*
 """
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        self._write_text(file_path, content)
     
     def _export_text(self, analysis: RepositoryAnalysis, file_path: str):
         """Export analysis as plain text file"""
@@ -159,8 +176,16 @@ Last Updated: {analysis.updated_at.strftime('%Y-%m-%d %H:%M:%S')}
 Generated by Repo Insight Generator
 """
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        self._write_text(file_path, content)
+    
+    def _write_text(self, file_path: str, content: str):
+        """Write a text export, zstd-compressing it when the path ends in .zst"""
+        data = content.encode('utf-8')
+        if file_path.endswith('.zst'):
+            data = zstandard.ZstdCompressor(level=3).compress(data)
+        
+        with open(file_path, 'wb') as f:
+            f.write(data)
     
     def _export_pdf(self, analysis: RepositoryAnalysis, file_path: str):
         """Export analysis as PDF file"""
@@ -394,4 +419,21 @@ Generated by Repo Insight Generator
         """Delete an export file from filesystem"""
         file_path = self.get_export_file_path(export_file)
         if os.path.exists(file_path):
-            os.remove(file_path)
\ No newline at end of file
+            os.remove(file_path)
+
+
+# Process-wide instance shared by all requests
+_export_service = None
+_export_service_lock = threading.Lock()
+
+
+def get_export_service() -> ExportService:
+    """Return the shared ExportService, creating it on first use"""
+    global _export_service
+    
+    if _export_service is None:
+        with _export_service_lock:
+            if _export_service is None:
+                _export_service = ExportService()
+    
+    return _export_service
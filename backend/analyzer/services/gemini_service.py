@@ -1,52 +1,224 @@
 import google.generativeai as genai
 from django.conf import settings
-from typing import Dict, List, Optional
+from django.utils import timezone
+from google.api_core import exceptions as google_exceptions
+from typing import Dict, Iterable, List, Optional
+from datetime import timedelta
+from itertools import islice
+import hashlib
 import json
+import logging
+import orjson
 import re
+import threading
+from ..models import GeminiCache
+
+
+logger = logging.getLogger(__name__)
+
+
+# Gemini models to use, newest first
+MODEL_NAMES = [
+    'gemini-2.5-flash',           # Latest 2.5 model
+    'gemini-2.0-flash',           # 2.0 model
+    'gemini-1.5-flash',           # 1.5 fallback
+    'gemini-1.5-pro',             # Pro fallback
+]
+
+# Errors that mean a model is unavailable to this key (missing, not permitted,
+# or not supporting the request), so the next candidate is tried
+MODEL_FALLBACK_ERRORS = (
+    google_exceptions.NotFound,
+    google_exceptions.PermissionDenied,
+    google_exceptions.InvalidArgument,
+)
+
+# Categories returned for a detected technology stack
+TECH_STACK_CATEGORIES = [
+    'primary_languages', 'frameworks', 'databases', 'tools_and_services',
+    'deployment', 'testing', 'build_tools', 'package_managers',
+    'development_tools', 'api_technologies',
+]
+
+TECH_STACK_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        category: {'type': 'array', 'items': {'type': 'string'}}
+        for category in TECH_STACK_CATEGORIES
+    },
+}
+
+# Tools implied by a package file, used when AI tech stack detection fails
+PACKAGE_FILE_TOOLS = {
+    'package.json': ('package_managers', 'npm'),
+    'requirements.txt': ('package_managers', 'pip'),
+    'Gemfile': ('package_managers', 'bundler'),
+    'pom.xml': ('build_tools', 'maven'),
+    'build.gradle': ('build_tools', 'gradle'),
+    'Cargo.toml': ('package_managers', 'cargo'),
+}
+
+FULL_ANALYSIS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'summary': {'type': 'string'},
+        'tech_stack': TECH_STACK_SCHEMA,
+        'setup_instructions': {'type': 'string'},
+    },
+    'required': ['summary', 'tech_stack', 'setup_instructions'],
+}
+
+# Star/fork counts drift between analyses of the same repository without
+# changing what the model would say; they are rounded in cache keys
+VOLATILE_COUNT_RE = re.compile(r'^(\s*- (?:Stars|Forks): )(\d+)$', re.MULTILINE)
+
+
+# File categories used by analyze_file_structure
+DOC_NAME_PARTS = ('readme', 'license', 'changelog', 'contributing')
+CONFIG_EXTENSIONS = ('.json', '.yml', '.yaml', '.toml', '.ini', '.config')
+TEST_NAME_PARTS = ('test', 'spec')
+# Matched as suffixes, so variants the old substring check caught are listed explicitly
+SOURCE_EXTENSIONS = (
+    '.py', '.pyi', '.pyx', '.js', '.jsx', '.mjs', '.cjs', '.ts', '.tsx', '.mts', '.cts',
+    '.java', '.c', '.h', '.cpp', '.cc', '.cxx', '.hpp', '.hh', '.hxx', '.cs',
+    '.go', '.rs', '.rb',
+)
+ASSET_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico')
+IMPORTANT_FILE_NAMES = frozenset({'package.json', 'requirements.txt', 'Gemfile', 'pom.xml', 'Cargo.toml'})
+
+
+def _round_count(match) -> str:
+    """Round a matched count to two significant figures (1234 -> ~1200)"""
+    return f"{match.group(1)}~{int(float(f'{int(match.group(2)):.2g}'))}"
 
 
 class GeminiService:
     """Service to interact with Google Gemini Pro API for repository analysis"""
     
+    # Name of the model that last served a request, shared across instances
+    _working_model_name = None
+    
     def __init__(self):
         if not settings.GEMINI_API_KEY:
             raise ValueError("GEMINI_API_KEY is required in settings")
         
         genai.configure(api_key=settings.GEMINI_API_KEY)
         
-        # Try to use the latest Gemini models, prioritizing newest versions
-        model_names = [
-            'gemini-2.5-flash',           # Latest 2.5 model
-            'models/gemini-2.5-flash',    # Alternative format
-            'gemini-2.0-flash',           # 2.0 model
-            'models/gemini-2.0-flash',    # Alternative format
-            'gemini-1.5-flash',           # 1.5 fallback
-            'models/gemini-1.5-flash',    # Alternative format
-            'gemini-1.5-pro',             # Pro fallback
-            'models/gemini-1.5-pro'       # Alternative format
-        ]
-        
-        self.model = None
-        last_error = None
-        
-        for model_name in model_names:
-            try:
-                print(f"🔄 Trying model: {model_name}")
-                self.model = genai.GenerativeModel(model_name)
-                # Test the model with a simple request
-                test_response = self.model.generate_content("Test")
-                print(f"✅ Successfully using Gemini model: {model_name}")
-                break
-            except Exception as e:
-                print(f"⚠️ Model {model_name} failed: {str(e)}")
-                last_error = e
-                continue
-        
-        if not self.model:
-            raise ValueError(f"No working Gemini model found. Last error: {last_error}. Please check your API key and model availability.")
+        # Start from the model that last worked in this process, without a
+        # probe request; unavailable models are skipped on the first real call
+        working_model = GeminiService._working_model_name
+        self.model_index = MODEL_NAMES.index(working_model) if working_model in MODEL_NAMES else 0
+        self.model = genai.GenerativeModel(MODEL_NAMES[self.model_index])
+        # The service is shared by all threads; guards model_index/model
+        self._model_lock = threading.Lock()
+    
+    def build_context(self, repo_info: Dict, languages: Dict = None,
+                      package_files: Dict = None, file_structure: List = None) -> Dict:
+        """
+        Precompute the prompt fragments shared by the generation prompts
+        
+        Building these once per analysis avoids re-formatting the same
+        repository data for every Gemini call.
+        
+        Args:
+            repo_info: Basic repository information from GitHub API
+            languages: Programming languages with byte counts
+            package_files: Dictionary of package/dependency files
+            file_structure: List of files and directories
+            
+        Returns:
+            Dictionary of formatted prompt fragments
+        """
+        header = "\n        ".join([
+            f"- Name: {repo_info.get('name', 'N/A')}",
+            f"- Description: {repo_info.get('description', 'N/A')}",
+            f"- Primary Language: {repo_info.get('language', 'N/A')}",
+            f"- Stars: {repo_info.get('stars', 0)}",
+            f"- Forks: {repo_info.get('forks', 0)}",
+            f"- Topics: {', '.join(repo_info.get('topics', []))}",
+        ])
+        
+        return {
+            'header': header,
+            'languages': orjson.dumps(languages, option=orjson.OPT_INDENT_2).decode() if languages else "No language data",
+            'package_files': self._format_package_files(package_files) if package_files else "No package files found",
+            'file_structure': (
+                self._format_file_structure(islice(file_structure, 50))
+                if file_structure else "No file structure data"
+            ),
+        }
+    
+    def generate_full_analysis(self, repo_info: Dict, languages: Dict = None,
+                               readme_content: str = None, package_files: Dict = None,
+                               file_structure: List = None, context: Dict = None) -> Dict:
+        """
+        Generate summary, tech stack and setup instructions in a single request
+        
+        The repository context is embedded once and Gemini is asked for a JSON
+        document constrained by FULL_ANALYSIS_SCHEMA.
+        
+        Args:
+            repo_info: Basic repository information from GitHub API
+            languages: Programming languages with byte counts
+            readme_content: Content of README file
+            package_files: Dictionary of package/dependency files
+            file_structure: List of files and directories
+            context: Prompt fragments from build_context (computed if omitted)
+            
+        Returns:
+            Dictionary with 'summary', 'tech_stack' and 'setup_instructions'
+            
+        Raises:
+            Exception: If generation fails or the response is not valid JSON
+        """
+        context = context or self.build_context(repo_info, languages, package_files, file_structure)
+        
+        prompt = f"""
+        Analyze this GitHub repository.
+
+        Repository Information:
+        {context['header']}
+
+        Programming Languages (by bytes of code):
+        {context['languages']}
+
+        {"README Content:" if readme_content else ""}
+        {readme_content[:3000] if readme_content else "No README available"}
+
+        {"Package Files:" if package_files else ""}
+        {context['package_files']}
+
+        File Structure Sample:
+        {context['file_structure']}
+
+        Respond with a JSON object containing:
+        - "summary": a well-structured summary without markdown headers covering what the
+          project does (2-3 sentences), its main purpose and target audience, key features
+          and capabilities, and notable technologies or frameworks used.
+        - "tech_stack": the detected technology stack. Only include technologies that you
+          can confidently identify from the provided information.
+        - "setup_instructions": clear, numbered setup steps without markdown headers covering
+          prerequisites, installation, configuration, how to run the application, basic
+          usage examples and common troubleshooting tips. Be specific about commands and
+          file locations where possible.
+        """
+        
+        response_text = self._cached_generate(prompt, generation_config={
+            'response_mime_type': 'application/json',
+            'response_schema': FULL_ANALYSIS_SCHEMA,
+        })
+        data = orjson.loads(response_text)
+        
+        tech_stack = data.get('tech_stack') or {}
+        
+        return {
+            'summary': (data.get('summary') or '').strip(),
+            'tech_stack': {category: tech_stack.get(category, []) for category in TECH_STACK_CATEGORIES},
+            'setup_instructions': (data.get('setup_instructions') or '').strip(),
+        }
     
     def generate_repository_summary(self, repo_info: Dict, readme_content: str = None, 
-                                   package_files: Dict = None) -> str:
+                                   package_files: Dict = None, context: Dict = None) -> str:
         """
         Generate a comprehensive summary of the repository
         
@@ -54,26 +226,24 @@ class GeminiService:
             repo_info: Basic repository information from GitHub API
             readme_content: Content of README file
             package_files: Dictionary of package/dependency files
+            context: Prompt fragments from build_context (computed if omitted)
             
         Returns:
             Generated summary text
         """
+        context = context or self.build_context(repo_info, package_files=package_files)
+        
         prompt = f"""
         Analyze this GitHub repository and provide a comprehensive summary:
 
         Repository Information:
-        - Name: {repo_info.get('name', 'N/A')}
-        - Description: {repo_info.get('description', 'N/A')}
-        - Primary Language: {repo_info.get('language', 'N/A')}
-        - Stars: {repo_info.get('stars', 0)}
-        - Forks: {repo_info.get('forks', 0)}
-        - Topics: {', '.join(repo_info.get('topics', []))}
+        {context['header']}
         
         {"README Content:" if readme_content else ""}
         {readme_content[:3000] if readme_content else "No README available"}
         
         {"Package Files:" if package_files else ""}
-        {self._format_package_files(package_files) if package_files else "No package files found"}
+        {context['package_files']}
         
         Please provide:
         1. A clear, concise summary of what this project does (2-3 sentences)
@@ -85,13 +255,12 @@ class GeminiService:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            return self._cached_generate(prompt)
         except Exception as e:
             return f"Failed to generate summary: {str(e)}"
     
     def detect_tech_stack(self, repo_info: Dict, languages: Dict, 
-                         package_files: Dict, file_structure: List) -> Dict:
+                         package_files: Dict, file_structure: List, context: Dict = None) -> Dict:
         """
         Analyze and detect the technology stack used in the repository
         
@@ -100,21 +269,24 @@ class GeminiService:
             languages: Programming languages with byte counts
             package_files: Dictionary of package/dependency files
             file_structure: List of files and directories
+            context: Prompt fragments from build_context (computed if omitted)
             
         Returns:
             Dictionary containing detected tech stack information
         """
+        context = context or self.build_context(repo_info, languages, package_files, file_structure)
+        
         prompt = f"""
         Analyze this repository's technology stack and provide a detailed breakdown:
 
         Programming Languages (by bytes of code):
-        {json.dumps(languages, indent=2) if languages else "No language data"}
+        {context['languages']}
 
         Package/Dependency Files:
-        {self._format_package_files(package_files) if package_files else "No package files found"}
+        {context['package_files']}
 
         File Structure Sample:
-        {self._format_file_structure(file_structure[:50]) if file_structure else "No file structure data"}
+        {context['file_structure']}
 
         Repository Metadata:
         - Primary Language: {repo_info.get('language', 'N/A')}
@@ -139,26 +311,22 @@ class GeminiService:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            # Clean the response to extract JSON
-            response_text = response.text.strip()
-            
-            # Remove markdown code block markers if present
-            response_text = re.sub(r'^```json\s*', '', response_text)
-            response_text = re.sub(r'\s*```$', '', response_text)
-            
-            # Try to parse JSON
-            tech_stack = json.loads(response_text)
-            return tech_stack
+            # The schema constrains decoding, so the reply is always bare JSON
+            response_text = self._cached_generate(prompt, generation_config={
+                'response_mime_type': 'application/json',
+                'response_schema': TECH_STACK_SCHEMA,
+            })
+            return self._parse_tech_stack_response(response_text)
             
         except json.JSONDecodeError:
-            # Fallback: create a simple tech stack from available data
+            # Fallback (e.g. truncated reply): create a simple tech stack from available data
             return self._create_fallback_tech_stack(languages, package_files)
         except Exception as e:
             return {"error": f"Failed to detect tech stack: {str(e)}"}
     
     def generate_setup_instructions(self, repo_info: Dict, readme_content: str = None,
-                                   package_files: Dict = None, tech_stack: Dict = None) -> str:
+                                   package_files: Dict = None, tech_stack: Dict = None,
+                                   context: Dict = None) -> str:
         """
         Generate setup and installation instructions for the repository
         
@@ -167,10 +335,13 @@ class GeminiService:
             readme_content: Content of README file
             package_files: Dictionary of package/dependency files
             tech_stack: Detected technology stack
+            context: Prompt fragments from build_context (computed if omitted)
             
         Returns:
             Generated setup instructions
         """
+        context = context or self.build_context(repo_info, package_files=package_files)
+        
         prompt = f"""
         Generate comprehensive setup and installation instructions for this repository:
 
@@ -181,10 +352,10 @@ class GeminiService:
         {readme_content[:2000] if readme_content else "No README available"}
         
         {"Package Files:" if package_files else ""}
-        {self._format_package_files(package_files) if package_files else "No package files found"}
+        {context['package_files']}
         
         {"Detected Tech Stack:" if tech_stack else ""}
-        {json.dumps(tech_stack, indent=2) if tech_stack else "No tech stack data"}
+        {orjson.dumps(tech_stack, option=orjson.OPT_INDENT_2).decode() if tech_stack else "No tech stack data"}
 
         Please provide step-by-step setup instructions including:
         1. Prerequisites and system requirements
@@ -199,8 +370,7 @@ class GeminiService:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            return self._cached_generate(prompt)
         except Exception as e:
             return f"Failed to generate setup instructions: {str(e)}"
     
@@ -236,21 +406,127 @@ class GeminiService:
                 # Categorize files
                 lower_name = file_name.lower()
                 
-                if any(name in lower_name for name in ['readme', 'license', 'changelog', 'contributing']):
+                # Cheapest check first: exact manifest names
+                if file_name in IMPORTANT_FILE_NAMES:
+                    structure["important_files"].append(file_name)
+                elif any(part in lower_name for part in DOC_NAME_PARTS):
                     structure["documentation"].append(file_name)
-                elif any(ext in lower_name for ext in ['.config', '.json', '.yml', '.yaml', '.toml', '.ini']):
+                elif lower_name.endswith(CONFIG_EXTENSIONS) or '.config' in lower_name:
                     structure["config_files"].append(file_name)
-                elif any(name in lower_name for name in ['test', 'spec', '__test__']):
+                elif any(part in lower_name for part in TEST_NAME_PARTS):
                     structure["tests"].append(file_name)
-                elif any(ext in lower_name for ext in ['.py', '.js', '.ts', '.java', '.cpp', '.c', '.go', '.rs', '.rb']):
+                elif lower_name.endswith(SOURCE_EXTENSIONS):
                     structure["source_code"].append(file_name)
-                elif any(ext in lower_name for ext in ['.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico']):
+                elif lower_name.endswith(ASSET_EXTENSIONS):
                     structure["assets"].append(file_name)
-                elif file_name in ['package.json', 'requirements.txt', 'Gemfile', 'pom.xml', 'Cargo.toml']:
-                    structure["important_files"].append(file_name)
         
         return structure
     
+    def _parse_tech_stack_response(self, response_text: str) -> Dict:
+        """
+        Parse a JSON tech stack response into the known categories
+        
+        Args:
+            response_text: Raw response text from Gemini
+            
+        Returns:
+            Dictionary mapping each tech stack category to a list
+            
+        Raises:
+            json.JSONDecodeError: If the response is not valid JSON
+        """
+        data = orjson.loads(response_text)
+        
+        return {category: data.get(category, []) for category in TECH_STACK_CATEGORIES}
+    
+    def _cached_generate(self, prompt: str, generation_config: Dict = None) -> str:
+        """
+        Generate content for a prompt, reusing a stored response when available
+        
+        Args:
+            prompt: Prompt text
+            generation_config: Optional Gemini generation config
+            
+        Returns:
+            Stripped response text
+        """
+        prompt_hash = self._prompt_hash(prompt, generation_config)
+        
+        cached = GeminiCache.objects.filter(
+            prompt_hash=prompt_hash,
+            created_at__gte=timezone.now() - timedelta(seconds=settings.GEMINI_CACHE_TIMEOUT)
+        ).values_list('response', flat=True).first()
+        if cached is not None:
+            return cached
+        
+        response, model_name = self._generate_content(prompt, generation_config)
+        response_text = response.text.strip()
+        
+        # Store under the model that actually answered (the first choice may
+        # have been unavailable); refreshing created_at restarts the entry's lifetime
+        now = timezone.now()
+        GeminiCache.objects.update_or_create(
+            prompt_hash=self._prompt_hash(prompt, generation_config, model_name),
+            defaults={
+                'model_name': model_name,
+                'response': response_text,
+                'created_at': now,
+            }
+        )
+        
+        # Expired entries are never read again; prune them so the table stays bounded
+        GeminiCache.objects.filter(
+            created_at__lt=now - timedelta(seconds=settings.GEMINI_CACHE_TIMEOUT)
+        ).delete()
+        
+        return response_text
+    
+    def _prompt_hash(self, prompt: str, generation_config: Dict = None,
+                     model_name: str = None) -> str:
+        """Hash the model name (current model by default), prompt and generation config"""
+        # Near-identical prompts (only star/fork counts moved) share an entry
+        prompt = VOLATILE_COUNT_RE.sub(_round_count, prompt)
+        key = f"{model_name or self.model.model_name}|{prompt}"
+        if generation_config:
+            key += f"|{json.dumps(generation_config, sort_keys=True)}"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+    
+    def _generate_content(self, prompt: str, generation_config: Dict = None):
+        """
+        Call Gemini, moving on to the next candidate model if the current one
+        is not available
+        
+        Args:
+            prompt: Prompt text
+            generation_config: Optional Gemini generation config
+            
+        Returns:
+            Tuple of (Gemini response, name of the model that produced it)
+            
+        Raises:
+            ValueError: If none of the candidate models are available
+        """
+        with self._model_lock:
+            index, model = self.model_index, self.model
+        
+        while True:
+            try:
+                response = model.generate_content(prompt, generation_config=generation_config)
+                GeminiService._working_model_name = MODEL_NAMES[index]
+                return response, model.model_name
+            except MODEL_FALLBACK_ERRORS as e:
+                logger.warning("Model %s failed: %s", MODEL_NAMES[index], e)
+                
+                if index + 1 >= len(MODEL_NAMES):
+                    raise ValueError(f"No working Gemini model found. Last error: {e}. Please check your API key and model availability.")
+                
+                with self._model_lock:
+                    # Advance only if no other thread has moved on already
+                    if self.model_index == index:
+                        self.model_index = index + 1
+                        self.model = genai.GenerativeModel(MODEL_NAMES[self.model_index])
+                    index, model = self.model_index, self.model
+    
     def _format_package_files(self, package_files: Dict) -> str:
         """Format package files for prompt inclusion"""
         if not package_files:
@@ -264,7 +540,7 @@ class GeminiService:
         
         return "\n\n".join(formatted)
     
-    def _format_file_structure(self, file_list: List[Dict]) -> str:
+    def _format_file_structure(self, file_list: Iterable[Dict]) -> str:
         """Format file structure for prompt inclusion"""
         formatted = []
         for file_info in file_list:
@@ -281,33 +557,32 @@ class GeminiService:
     
     def _create_fallback_tech_stack(self, languages: Dict, package_files: Dict) -> Dict:
         """Create a fallback tech stack when AI analysis fails"""
-        tech_stack = {
-            "primary_languages": list(languages.keys()) if languages else [],
-            "frameworks": [],
-            "databases": [],
-            "tools_and_services": [],
-            "deployment": [],
-            "testing": [],
-            "build_tools": [],
-            "package_managers": [],
-            "development_tools": [],
-            "api_technologies": []
-        }
+        tech_stack = {category: [] for category in TECH_STACK_CATEGORIES}
+        tech_stack["primary_languages"] = list(languages.keys()) if languages else []
         
         # Analyze package files for additional info
         if package_files:
             for filename in package_files.keys():
-                if filename == 'package.json':
-                    tech_stack["package_managers"].append("npm")
-                elif filename == 'requirements.txt':
-                    tech_stack["package_managers"].append("pip")
-                elif filename == 'Gemfile':
-                    tech_stack["package_managers"].append("bundler")
-                elif filename == 'pom.xml':
-                    tech_stack["build_tools"].append("maven")
-                elif filename == 'build.gradle':
-                    tech_stack["build_tools"].append("gradle")
-                elif filename == 'Cargo.toml':
-                    tech_stack["package_managers"].append("cargo")
-        
-        return tech_stack
\ No newline at end of file
+                match = PACKAGE_FILE_TOOLS.get(filename)
+                if match:
+                    category, tool = match
+                    tech_stack[category].append(tool)
+        
+        return tech_stack
+
+
+# Process-wide instance shared by all requests
+_gemini_service = None
+_gemini_service_lock = threading.Lock()
+
+
+def get_gemini_service() -> GeminiService:
+    """Return the shared GeminiService, creating it on first use"""
+    global _gemini_service
+    
+    if _gemini_service is None:
+        with _gemini_service_lock:
+            if _gemini_service is None:
+                _gemini_service = GeminiService()
+    
+    return _gemini_service
@@ -1,9 +1,47 @@
 import requests
 import re
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Tuple
 from urllib.parse import urlparse
 from django.conf import settings
+from django.core.cache import caches
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import base64
+import hashlib
+import logging
+import orjson
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Repository URLs in HTTPS or SSH form, with an optional .git suffix
+_GITHUB_URL_RE = re.compile(r'(?:https?://github\.com/|git@github\.com:)([^/]+)/([^/]+?)(?:\.git)?')
+
+# README candidates in order of preference
+_README_VARIANTS = ('README.md', 'README.rst', 'README.txt', 'README')
+_README_VARIANTS_LOWER = tuple(name.lower() for name in _README_VARIANTS)
+
+# Dependency manifests worth sending to the model, in prompt order
+_PACKAGE_FILES = (
+    'package.json', 'requirements.txt', 'Pipfile', 'poetry.lock',
+    'Gemfile', 'composer.json', 'pom.xml', 'build.gradle',
+    'Cargo.toml', 'go.mod', 'pubspec.yaml', 'Package.swift'
+)
+_IMPORTANT_FILES = frozenset(_PACKAGE_FILES)
+
+# Prompts use the first 3000 characters of a README and 500 of a package file;
+# a UTF-8 character is at most 4 bytes, so nothing past these ranges is ever used
+README_MAX_BYTES = 3000 * 4
+PACKAGE_FILE_MAX_BYTES = 500 * 4
+
+# Stop spending requests once this few (at most a tenth of the window's limit)
+# remain, and wait for the window to reset only if that happens within
+# RATE_LIMIT_MAX_WAIT seconds
+RATE_LIMIT_RESERVE = 100
+RATE_LIMIT_MAX_WAIT = 60
 
 
 class GitHubService:
@@ -19,6 +57,167 @@ class GitHubService:
         # Add authentication if token is provided
         if settings.GITHUB_TOKEN:
             self.headers["Authorization"] = f"Bearer {settings.GITHUB_TOKEN}"
+        
+        # Share one pooled session so TCP/TLS connections are reused across calls
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # Transient gateway errors are retried on the pooled connection with backoff
+        retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+        self.session.mount('https://', HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retries))
+        
+        # Upper bound on concurrent file fetches
+        self.max_workers = 16
+        
+        # Cache of response bodies keyed by request, revalidated via ETag
+        self.cache = caches['github']
+        
+        # Rate-limit budget as last reported by GitHub (shared by all threads)
+        self._rate_limit_lock = threading.Lock()
+        self._rate_limit_remaining = None
+        self._rate_limit_limit = None
+        self._rate_limit_reset = 0.0
+    
+    def _wait_for_rate_limit(self):
+        """
+        Hold off requests while GitHub reports the rate limit nearly used up
+        
+        Raises:
+            Exception: If the limit resets too far in the future to wait for
+        """
+        with self._rate_limit_lock:
+            remaining = self._rate_limit_remaining
+            limit = self._rate_limit_limit
+            reset = self._rate_limit_reset
+        
+        if remaining is None:
+            return
+        
+        # Keep the reserve proportional to the window: unauthenticated clients
+        # only get 60 requests per hour
+        reserve = min(RATE_LIMIT_RESERVE, limit // 10) if limit else RATE_LIMIT_RESERVE
+        if remaining >= reserve:
+            return
+        
+        wait = reset - time.time()
+        if wait <= 0:
+            return
+        if wait > RATE_LIMIT_MAX_WAIT:
+            raise Exception(
+                f"GitHub API rate limit nearly exhausted; it resets in {int(wait)} seconds. "
+                "Please add a GitHub token or try again later."
+            )
+        
+        logger.warning("GitHub API rate limit nearly exhausted, waiting %.0f seconds", wait)
+        time.sleep(wait)
+    
+    def _update_rate_limit(self, response: requests.Response):
+        """Record the rate-limit budget reported in a response's headers"""
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        limit = response.headers.get('X-RateLimit-Limit')
+        reset = response.headers.get('X-RateLimit-Reset')
+        if remaining is None or reset is None:
+            return
+        
+        with self._rate_limit_lock:
+            self._rate_limit_remaining = int(remaining)
+            self._rate_limit_limit = int(limit) if limit is not None else None
+            self._rate_limit_reset = float(reset)
+    
+    @staticmethod
+    def _read_limited(response: requests.Response, max_bytes: int) -> bytes:
+        """
+        Read at most max_bytes of a streamed response body
+        
+        Servers that ignore the Range header would otherwise make us download
+        (and hold in memory) the whole file. The connection is dropped as soon
+        as enough bytes have arrived.
+        
+        Args:
+            response: Response obtained with stream=True
+            max_bytes: Maximum number of bytes to keep
+            
+        Returns:
+            The first max_bytes bytes of the body
+        """
+        buffer = bytearray()
+        for chunk in response.iter_content(chunk_size=4096):
+            buffer += chunk
+            if len(buffer) >= max_bytes:
+                response.close()
+                break
+        return bytes(buffer[:max_bytes])
+    
+    def _get(self, url: str, params: Dict = None, headers: Dict = None,
+             timeout: int = 30, max_bytes: int = None) -> requests.Response:
+        """
+        Perform a conditional GET against the GitHub API
+        
+        Previously seen responses are revalidated with If-None-Match /
+        If-Modified-Since. A 304 reply does not count against the rate limit
+        and is transparently turned back into a 200 carrying the cached body.
+        
+        Args:
+            url: Request URL
+            params: Query parameters
+            headers: Extra headers merged over the session headers
+            timeout: Request timeout in seconds
+            max_bytes: Stream the body and keep only its first max_bytes bytes
+            
+        Returns:
+            requests.Response instance
+        """
+        request_headers = dict(headers or {})
+        cache_key = self._cache_key(url, params, request_headers)
+        cached = self.cache.get(cache_key)
+        
+        if cached:
+            if cached.get('etag'):
+                request_headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                request_headers['If-Modified-Since'] = cached['last_modified']
+        
+        self._wait_for_rate_limit()
+        response = self.session.get(url, params=params, headers=request_headers,
+                                    timeout=timeout, stream=bool(max_bytes))
+        self._update_rate_limit(response)
+        if max_bytes:
+            response._content = self._read_limited(response, max_bytes)
+        
+        if response.status_code == 304 and cached:
+            response.status_code = cached.get('status_code', 200)
+            response._content = cached['content']
+            if cached.get('content_type'):
+                response.headers['Content-Type'] = cached['content_type']
+            return response
+        
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        
+        if response.status_code in (200, 206) and (etag or last_modified):
+            self.cache.set(cache_key, {
+                'status_code': response.status_code,
+                'etag': etag,
+                'last_modified': last_modified,
+                'content': response.content,
+                'content_type': response.headers.get('Content-Type'),
+                'fetched_at': time.time(),
+                'authenticated': 'Authorization' in self.session.headers,
+            })
+        
+        return response
+    
+    def _cache_key(self, url: str, params: Dict = None, headers: Dict = None) -> str:
+        """Build a cache key from the request URL, parameters and credentials"""
+        accept = (headers or {}).get('Accept', self.session.headers.get('Accept', ''))
+        parts = [
+            url,
+            repr(sorted((params or {}).items())),
+            accept,
+            (headers or {}).get('Range', ''),
+            self.session.headers.get('Authorization', ''),
+        ]
+        digest = hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+        return f"github:{digest}"
     
     def parse_github_url(self, url: str) -> Tuple[str, str]:
         """
@@ -36,24 +235,9 @@ class GitHubService:
         # Clean the URL
         url = url.strip().rstrip('/')
         
-        # Remove .git extension if present
-        if url.endswith('.git'):
-            url = url[:-4]
-        
-        # Handle various GitHub URL formats
-        patterns = [
-            r'https?://github\.com/([^/]+)/([^/]+)/?$',
-            r'git@github\.com:([^/]+)/([^/]+)$',
-        ]
-        
-        for pattern in patterns:
-            match = re.match(pattern, url)
-            if match:
-                owner = match.group(1)
-                repo = match.group(2)
-                # Clean repo name further if needed
-                repo = repo.rstrip('.git')
-                return owner, repo
+        match = _GITHUB_URL_RE.fullmatch(url)
+        if match:
+            return match.group(1), match.group(2)
         
         raise ValueError(f"Invalid GitHub repository URL: {url}")
     
@@ -71,7 +255,7 @@ class GitHubService:
         url = f"{self.base_url}/repos/{owner}/{repo}"
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=30)
+            response = self._get(url)
             
             # Handle specific error cases
             if response.status_code == 401:
@@ -96,7 +280,7 @@ class GitHubService:
             
             response.raise_for_status()
             
-            data = response.json()
+            data = orjson.loads(response.content)
             
             return {
                 'name': data.get('name', ''),
@@ -118,7 +302,7 @@ class GitHubService:
                 'open_issues': data.get('open_issues_count', 0),
             }
             
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
             if hasattr(e, 'response') and e.response is not None:
                 if e.response.status_code == 401:
                     # This should be caught above, but just in case
@@ -150,15 +334,46 @@ class GitHubService:
             params['ref'] = branch
             
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
+            response = self._get(url, params=params)
             response.raise_for_status()
             
-            return response.json()
+            return orjson.loads(response.content)
             
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
             raise Exception(f"Failed to fetch repository contents: {str(e)}")
     
-    def get_file_content(self, owner: str, repo: str, path: str, branch: str = None) -> str:
+    def get_repository_tree(self, owner: str, repo: str, ref: str = None) -> Dict:
+        """
+        Get the full repository tree in a single request via the Git Trees API
+        
+        Args:
+            owner: Repository owner
+            repo: Repository name
+            ref: Branch name, tag or commit SHA (defaults to HEAD)
+            
+        Returns:
+            Dictionary with 'sha', 'tree' (flat list of entries with 'path',
+            'type', 'size' and 'sha') and 'truncated'
+        """
+        url = f"{self.base_url}/repos/{owner}/{repo}/git/trees/{ref or 'HEAD'}"
+        params = {'recursive': 1}
+        
+        try:
+            response = self._get(url, params=params)
+            response.raise_for_status()
+            
+            data = orjson.loads(response.content)
+            return {
+                'sha': data.get('sha', ''),
+                'tree': data.get('tree', []),
+                'truncated': data.get('truncated', False),
+            }
+            
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+            raise Exception(f"Failed to fetch repository tree: {str(e)}")
+    
+    def get_file_content(self, owner: str, repo: str, path: str, branch: str = None,
+                         max_bytes: int = None) -> str:
         """
         Get content of a specific file
         
@@ -167,6 +382,7 @@ class GitHubService:
             repo: Repository name
             path: Path to the file
             branch: Branch name (defaults to default branch)
+            max_bytes: Only fetch the first max_bytes bytes (entire file if None)
             
         Returns:
             File content as string
@@ -176,23 +392,80 @@ class GitHubService:
         
         if branch:
             params['ref'] = branch
+        
+        # The raw media type returns file bytes directly, skipping base64
+        headers = {'Accept': 'application/vnd.github.raw'}
+        if max_bytes:
+            headers['Range'] = f"bytes=0-{max_bytes - 1}"
             
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
+            response = self._get(url, params=params, headers=headers, max_bytes=max_bytes)
             response.raise_for_status()
             
-            data = response.json()
+            if not response.headers.get('Content-Type', '').startswith('application/json'):
+                # Servers may ignore Range and reply 200 with the full body
+                return response.content[:max_bytes].decode('utf-8', errors='ignore')
             
-            # If it's a file, decode the base64 content
-            if data.get('type') == 'file' and data.get('content'):
-                content = base64.b64decode(data['content']).decode('utf-8', errors='ignore')
+            # JSON is only returned for non-file paths; decode base64 content if present
+            data = orjson.loads(response.content)
+            
+            if isinstance(data, dict) and data.get('type') == 'file' and data.get('content'):
+                content = base64.b64decode(data['content'])[:max_bytes].decode('utf-8', errors='ignore')
                 return content
             
             return ""
             
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
             raise Exception(f"Failed to fetch file content: {str(e)}")
     
+    def get_blob_content(self, owner: str, repo: str, sha: str, max_bytes: int = None) -> str:
+        """
+        Get content of a file by its blob SHA
+        
+        Blobs are content-addressed and never change, so a cached blob is
+        returned without any request (not even a conditional one).
+        
+        Args:
+            owner: Repository owner
+            repo: Repository name
+            sha: Blob SHA from the repository tree
+            max_bytes: Only return the first max_bytes bytes (entire blob if None)
+            
+        Returns:
+            File content as string
+        """
+        cache_key = f"github:blob:{sha}:{max_bytes or ''}"
+        content = self.cache.get(cache_key)
+        if content is not None:
+            return content
+        
+        url = f"{self.base_url}/repos/{owner}/{repo}/git/blobs/{sha}"
+        headers = {'Accept': 'application/vnd.github.raw+json'}
+        if max_bytes:
+            headers['Range'] = f"bytes=0-{max_bytes - 1}"
+        
+        try:
+            self._wait_for_rate_limit()
+            response = self.session.get(url, headers=headers, timeout=30, stream=True)
+            self._update_rate_limit(response)
+            response.raise_for_status()
+            
+            if response.headers.get('Content-Type', '').startswith('application/json'):
+                # Fall back to the base64 JSON representation
+                data = orjson.loads(response.content)
+                raw = base64.b64decode(data.get('content', '')) if isinstance(data, dict) else b''
+            elif max_bytes:
+                raw = self._read_limited(response, max_bytes)
+            else:
+                raw = response.content
+            
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+            raise Exception(f"Failed to fetch blob content: {str(e)}")
+        
+        content = raw[:max_bytes].decode('utf-8', errors='ignore')
+        self.cache.set(cache_key, content, None)
+        return content
+    
     def get_repository_languages(self, owner: str, repo: str) -> Dict[str, int]:
         """
         Get programming languages used in the repository
@@ -207,12 +480,12 @@ class GitHubService:
         url = f"{self.base_url}/repos/{owner}/{repo}/languages"
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=30)
+            response = self._get(url)
             response.raise_for_status()
             
-            return response.json()
+            return orjson.loads(response.content)
             
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
             raise Exception(f"Failed to fetch repository languages: {str(e)}")
     
     def get_repository_topics(self, owner: str, repo: str) -> List[str]:
@@ -229,13 +502,13 @@ class GitHubService:
         url = f"{self.base_url}/repos/{owner}/{repo}/topics"
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=30)
+            response = self._get(url)
             response.raise_for_status()
             
-            data = response.json()
+            data = orjson.loads(response.content)
             return data.get('names', [])
             
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
             raise Exception(f"Failed to fetch repository topics: {str(e)}")
     
     def search_repository_files(self, owner: str, repo: str, filename: str) -> List[Dict]:
@@ -255,63 +528,132 @@ class GitHubService:
         params = {'q': query}
         
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
+            response = self._get(url, params=params)
             response.raise_for_status()
             
-            data = response.json()
+            data = orjson.loads(response.content)
             return data.get('items', [])
             
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
             raise Exception(f"Failed to search repository files: {str(e)}")
     
-    def get_readme_content(self, owner: str, repo: str) -> Optional[str]:
+    def get_readme_content(self, owner: str, repo: str,
+                           tree_blobs: Optional[Dict[str, str]] = None) -> Optional[str]:
         """
         Get README content from the repository
         
         Args:
             owner: Repository owner
             repo: Repository name
+            tree_blobs: Mapping of file path to blob SHA from the repository
+                tree; when given, only matching candidates are requested
             
         Returns:
             README content as string or None if not found
         """
-        readme_names = ['README.md', 'README.rst', 'README.txt', 'README']
+        readme_names = _README_VARIANTS
+        
+        if tree_blobs is not None:
+            # Match root-level READMEs case-insensitively, keeping preference order
+            root_files = {path.lower(): path for path in tree_blobs if '/' not in path}
+            readme_names = [root_files[name] for name in _README_VARIANTS_LOWER if name in root_files]
         
+        # Prompts only use the beginning of the README
+        found = self.get_files_content(owner, repo, readme_names, max_bytes=README_MAX_BYTES, blob_shas=tree_blobs)
+        
+        # Respect the preferred README order regardless of completion order
         for readme_name in readme_names:
-            try:
-                content = self.get_file_content(owner, repo, readme_name)
-                if content:
-                    return content
-            except:
-                continue
+            if found.get(readme_name):
+                return found[readme_name]
         
         return None
     
-    def get_package_files(self, owner: str, repo: str) -> Dict[str, str]:
+    def get_package_files(self, owner: str, repo: str,
+                          tree_blobs: Optional[Dict[str, str]] = None) -> Dict[str, str]:
         """
         Get common package/dependency files content
         
         Args:
             owner: Repository owner
             repo: Repository name
+            tree_blobs: Mapping of file path to blob SHA from the repository
+                tree; when given, only matching candidates are requested
             
         Returns:
             Dictionary mapping filename to content
         """
-        package_files = [
-            'package.json', 'requirements.txt', 'Pipfile', 'poetry.lock',
-            'Gemfile', 'composer.json', 'pom.xml', 'build.gradle',
-            'Cargo.toml', 'go.mod', 'pubspec.yaml', 'Package.swift'
-        ]
+        package_files = _PACKAGE_FILES
         
+        if tree_blobs is not None:
+            # Set intersection instead of testing each candidate against the tree
+            present = _IMPORTANT_FILES.intersection(tree_blobs)
+            package_files = [filename for filename in _PACKAGE_FILES if filename in present]
+        
+        # Prompts only use the beginning of each package file
+        found = self.get_files_content(
+            owner, repo, package_files, max_bytes=PACKAGE_FILE_MAX_BYTES, blob_shas=tree_blobs
+        )
+        
+        # Keep the candidate order stable for prompt construction
+        return {filename: found[filename] for filename in package_files if filename in found}
+    
+    def get_files_content(self, owner: str, repo: str, paths: Iterable[str],
+                          max_bytes: int = None,
+                          blob_shas: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        Fetch several files concurrently
+        
+        Args:
+            owner: Repository owner
+            repo: Repository name
+            paths: File paths to fetch
+            max_bytes: Only fetch the first max_bytes bytes of each file
+            blob_shas: Mapping of path to blob SHA; listed paths are fetched
+                (and cached) by SHA instead of by path
+            
+        Returns:
+            Dictionary mapping path to content for files that exist and are non-empty
+        """
+        paths = list(paths)
+        if not paths:
+            return {}
+        
+        blob_shas = blob_shas or {}
         results = {}
         
-        for filename in package_files:
-            try:
-                content = self.get_file_content(owner, repo, filename)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(paths))) as executor:
+            futures = {
+                (
+                    executor.submit(self.get_blob_content, owner, repo, blob_shas[path], max_bytes=max_bytes)
+                    if path in blob_shas else
+                    executor.submit(self.get_file_content, owner, repo, path, max_bytes=max_bytes)
+                ): path
+                for path in paths
+            }
+            
+            for future in as_completed(futures):
+                try:
+                    content = future.result()
+                except Exception:
+                    continue
                 if content:
-                    results[filename] = content
-            except:
-                continue
+                    results[futures[future]] = content
         
-        return results
\ No newline at end of file
+        return results
+
+
+# Process-wide instance shared by all requests
+_github_service = None
+_github_service_lock = threading.Lock()
+
+
+def get_github_service() -> GitHubService:
+    """Return the shared GitHubService, creating it on first use"""
+    global _github_service
+    
+    if _github_service is None:
+        with _github_service_lock:
+            if _github_service is None:
+                _github_service = GitHubService()
+    
+    return _github_service
@@ -1,81 +1,180 @@
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 import logging
-from .github_service import GitHubService
-from .gemini_service import GeminiService
+import threading
+from .github_service import get_github_service
+from .gemini_service import get_gemini_service
 from ..models import RepositoryAnalysis
 import json
 
 
 logger = logging.getLogger(__name__)
 
+# Statuses of an analysis that is queued or running
+IN_PROGRESS_STATUSES = ('pending', 'analyzing')
+
+# In-progress analyses untouched for this long are assumed to be lost (e.g. worker killed)
+STALE_ANALYSIS_AGE = timedelta(minutes=30)
+
+# Directories that are never walked into
+SKIP_DIRS = frozenset({
+    '.git', '.github', 'node_modules', '__pycache__', '.pytest_cache',
+    'venv', 'env', '.venv', '.env', 'dist', 'build', '.next',
+    'target', 'vendor', '.idea', '.vscode', '.DS_Store',
+    'coverage', '.coverage', '.nyc_output', 'logs', 'log'
+})
+
+# Most directory listings the truncated-tree fallback walk may request
+MAX_DIRECTORY_REQUESTS = 500
+
 
 class RepositoryAnalyzerService:
     """Main service for analyzing GitHub repositories"""
     
     def __init__(self):
-        self.github_service = GitHubService()
-        self.gemini_service = GeminiService()
+        # Services hold pooled clients and are shared across requests
+        self.github_service = get_github_service()
+        self.gemini_service = get_gemini_service()
+    
+    def create_analysis(self, repository_url: str) -> RepositoryAnalysis:
+        """
+        Create a pending analysis record for a repository
+        
+        Args:
+            repository_url: GitHub repository URL
+            
+        Returns:
+            RepositoryAnalysis instance with status 'pending'
+            
+        Raises:
+            ValueError: If URL is not a valid GitHub repository URL
+        """
+        owner, repo_name = self.github_service.parse_github_url(repository_url)
+        
+        return RepositoryAnalysis.objects.create(
+            repository_url=repository_url,
+            repository_name=repo_name,
+            owner=owner,
+            status='pending'
+        )
     
-    def analyze_repository(self, repository_url: str) -> RepositoryAnalysis:
+    def start_analysis(self, repository_url: str) -> Tuple[RepositoryAnalysis, bool]:
         """
-        Perform complete analysis of a GitHub repository
+        Create a pending analysis unless one is already in progress for the URL
+        
+        A partial unique constraint allows only one in-progress analysis per
+        URL, so concurrent requests join the same analysis instead of running
+        the pipeline twice.
         
         Args:
             repository_url: GitHub repository URL
             
         Returns:
-            RepositoryAnalysis instance with all analysis data
+            Tuple of (analysis, created); created is False when joining an
+            analysis that is already queued or running
         """
-        analysis = None
+        # Release analyses whose worker died so they don't block new ones
+        RepositoryAnalysis.objects.filter(
+            repository_url=repository_url,
+            status__in=IN_PROGRESS_STATUSES,
+            updated_at__lt=timezone.now() - STALE_ANALYSIS_AGE
+        ).update(status='failed', error_message='Analysis failed: timed out', updated_at=timezone.now())
+        
+        in_progress = self.get_in_progress_analysis(repository_url)
+        if in_progress:
+            return in_progress, False
         
         try:
-            # Parse GitHub URL
-            owner, repo_name = self.github_service.parse_github_url(repository_url)
+            with transaction.atomic():
+                return self.create_analysis(repository_url), True
+        except IntegrityError:
+            # Lost the race to a concurrent request; join its analysis
+            in_progress = self.get_in_progress_analysis(repository_url)
+            if in_progress is None:
+                raise
+            return in_progress, False
+    
+    def run_analysis(self, analysis: RepositoryAnalysis) -> RepositoryAnalysis:
+        """
+        Run the analysis pipeline for an existing analysis record
+        
+        Args:
+            analysis: RepositoryAnalysis instance to populate
             
-            # Create analysis record
-            analysis = RepositoryAnalysis.objects.create(
-                repository_url=repository_url,
-                repository_name=repo_name,
-                owner=owner,
-                status='analyzing'
-            )
+        Returns:
+            The updated RepositoryAnalysis instance
+        """
+        owner, repo_name = analysis.owner, analysis.repository_name
+        
+        try:
+            analysis.status = 'analyzing'
+            analysis.save(update_fields=['status', 'updated_at'])
             
-            logger.info(f"Starting analysis for {owner}/{repo_name}")
+            logger.info("Starting analysis for %s/%s", owner, repo_name)
             
-            # Step 1: Fetch basic repository information
-            repo_info = self.github_service.get_repository_info(owner, repo_name)
+            # Steps 1-3: Fetch repository info, languages, the tree, README and
+            # package files concurrently; the calls are network-bound
+            with ThreadPoolExecutor(max_workers=5) as executor:
+                info_future = executor.submit(self.github_service.get_repository_info, owner, repo_name)
+                languages_future = executor.submit(self.github_service.get_repository_languages, owner, repo_name)
+                tree_future = executor.submit(self.github_service.get_repository_tree, owner, repo_name)
+                
+                # Only request README/package files the tree says exist; fall back
+                # to probing every candidate when the listing is incomplete
+                try:
+                    repo_tree = tree_future.result()
+                except Exception:
+                    # Let the repository info request report the underlying error
+                    info_future.result()
+                    raise
+                
+                tree_blobs = None
+                if not repo_tree.get('truncated'):
+                    tree_blobs = {
+                        entry['path']: entry['sha'] for entry in repo_tree.get('tree', [])
+                        if entry.get('type') == 'blob'
+                    }
+                
+                readme_future = executor.submit(
+                    self.github_service.get_readme_content, owner, repo_name, tree_blobs
+                )
+                package_future = executor.submit(
+                    self.github_service.get_package_files, owner, repo_name, tree_blobs
+                )
+                
+                # Resolve repository info first so its specific errors take precedence
+                repo_info = info_future.result()
+                languages = languages_future.result()
+                readme_content = readme_future.result()
+                package_files = package_future.result()
             
-            # Step 2: Get additional repository data
-            languages = self.github_service.get_repository_languages(owner, repo_name)
-            readme_content = self.github_service.get_readme_content(owner, repo_name)
-            package_files = self.github_service.get_package_files(owner, repo_name)
+            # Build the structure from the tree, walking directories only if truncated
+            branch = repo_info.get('default_branch')
             
-            # Step 3: Get repository structure
-            repo_contents = self.github_service.get_repository_contents(owner, repo_name)
-            file_structure = self._build_file_structure(owner, repo_name, repo_contents)
+            if repo_tree.get('truncated'):
+                logger.warning("Tree for %s/%s is truncated, falling back to directory walk", owner, repo_name)
+                repo_contents = self.github_service.get_repository_contents(owner, repo_name)
+                file_structure = self._build_file_structure(owner, repo_name, repo_contents)
+            else:
+                file_structure = self._build_file_structure_from_tree(
+                    owner, repo_name, repo_tree.get('tree', []), branch
+                )
+                repo_contents = file_structure
             
-            # Step 4: Update basic repository metadata
+            # Step 4: Update basic repository metadata (saved with the results)
             analysis.description = repo_info.get('description') or ''
             analysis.stars = repo_info.get('stars', 0)
             analysis.forks = repo_info.get('forks', 0)
             analysis.language = repo_info.get('language') or ''
-            analysis.save()
+            analysis.tree_sha = repo_tree.get('sha', '')
             
             # Step 5: Generate AI-powered insights
-            logger.info("Generating repository summary...")
-            summary = self.gemini_service.generate_repository_summary(
-                repo_info, readme_content, package_files
-            )
-            
-            logger.info("Detecting technology stack...")
-            tech_stack = self.gemini_service.detect_tech_stack(
-                repo_info, languages, package_files, file_structure
-            )
-            
-            logger.info("Generating setup instructions...")
-            setup_instructions = self.gemini_service.generate_setup_instructions(
-                repo_info, readme_content, package_files, tech_stack
+            summary, tech_stack, setup_instructions = self._generate_insights(
+                repo_info, languages, readme_content, package_files, file_structure
             )
             
             logger.info("Analyzing file structure...")
@@ -97,41 +196,168 @@ class RepositoryAnalyzerService:
             analysis.file_structure = complete_file_structure
             analysis.setup_instructions = setup_instructions
             analysis.status = 'completed'
-            analysis.save()
+            self._finish_analysis(analysis, [
+                'description', 'stars', 'forks', 'language', 'tree_sha',
+                'summary', 'tech_stack', 'file_structure_zst', 'setup_instructions', 'status'
+            ])
             
-            logger.info(f"Analysis completed successfully for {owner}/{repo_name}")
+            logger.info("Analysis completed successfully for %s/%s", owner, repo_name)
             return analysis
             
         except Exception as e:
             error_message = f"Analysis failed: {str(e)}"
             logger.error(error_message)
             
-            if analysis:
-                analysis.status = 'failed'
-                analysis.error_message = error_message
-                analysis.save()
-                return analysis
+            analysis.status = 'failed'
+            analysis.error_message = error_message
+            self._finish_analysis(analysis, ['status', 'error_message'])
+            return analysis
+    
+    def _finish_analysis(self, analysis: RepositoryAnalysis, fields: List[str]):
+        """
+        Save the outcome of a run, but only if the row is still 'analyzing'
+        
+        A run that outlived STALE_ANALYSIS_AGE may have been marked failed
+        (and replaced by a new analysis) or deleted by a re-analysis; its
+        results must not overwrite that.
+        
+        Args:
+            analysis: RepositoryAnalysis instance holding the new values
+            fields: Names of the fields to write
+        """
+        analysis.updated_at = timezone.now()
+        values = {field: getattr(analysis, field) for field in fields + ['updated_at']}
+        
+        updated = RepositoryAnalysis.objects.filter(id=analysis.id, status='analyzing').update(**values)
+        if not updated:
+            logger.warning("Analysis %s is no longer running; discarding its %s result",
+                           analysis.id, analysis.status)
+    
+    def _generate_insights(self, repo_info: Dict, languages: Dict, readme_content: Optional[str],
+                           package_files: Dict, file_structure: List[Dict]):
+        """
+        Generate summary, tech stack and setup instructions
+        
+        Uses a single batched Gemini request and falls back to the individual
+        per-section prompts if the batched response cannot be used.
+        
+        Returns:
+            Tuple of (summary, tech_stack, setup_instructions)
+        """
+        # Format the shared repository context once for every prompt below
+        context = self.gemini_service.build_context(
+            repo_info, languages, package_files, file_structure
+        )
+        
+        try:
+            logger.info("Generating full repository analysis...")
+            insights = self.gemini_service.generate_full_analysis(
+                repo_info, languages, readme_content, package_files, file_structure, context=context
+            )
+            return insights['summary'], insights['tech_stack'], insights['setup_instructions']
+        except Exception as e:
+            logger.warning("Batched analysis failed, falling back to individual prompts: %s", e)
+        
+        # The summary is independent of the other two prompts, so run it alongside
+        # them; setup instructions still wait for the detected tech stack
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            logger.info("Generating repository summary...")
+            summary_future = executor.submit(
+                self.gemini_service.generate_repository_summary,
+                repo_info, readme_content, package_files, context=context
+            )
+            
+            logger.info("Detecting technology stack...")
+            tech_stack = self.gemini_service.detect_tech_stack(
+                repo_info, languages, package_files, file_structure, context=context
+            )
+            
+            logger.info("Generating setup instructions...")
+            setup_instructions = self.gemini_service.generate_setup_instructions(
+                repo_info, readme_content, package_files, tech_stack, context=context
+            )
+            
+            summary = summary_future.result()
+        
+        return summary, tech_stack, setup_instructions
+    
+    def _build_file_structure_from_tree(self, owner: str, repo_name: str,
+                                        tree_entries: List[Dict], branch: str = None,
+                                        max_depth: int = 3) -> List[Dict]:
+        """
+        Build the hierarchical file structure from a flat Git Trees listing
+        
+        Produces the same shape as _build_file_structure without any further
+        API calls.
+        
+        Args:
+            owner: Repository owner
+            repo_name: Repository name
+            tree_entries: Flat list of entries from the Git Trees API
+            branch: Branch used to build raw download URLs
+            max_depth: Maximum depth to include
+            
+        Returns:
+            List of dictionaries representing file structure
+        """
+        type_map = {'blob': 'file', 'tree': 'dir', 'commit': 'submodule'}
+        ref = branch or 'HEAD'
+        
+        structure = []
+        directories = {}
+        
+        # Recursive tree listings are pre-order, so parents precede their children
+        for entry in tree_entries:
+            path = entry.get('path', '')
+            parent_path, _, name = path.rpartition('/')
+            depth = path.count('/')
+            
+            if depth >= max_depth:
+                continue
+            
+            if parent_path:
+                parent = directories.get(parent_path)
+                if parent is None:
+                    # Parent was skipped or is beyond the traversal depth
+                    continue
+                siblings = parent["children"]
             else:
-                # Create a failed analysis record
-                try:
-                    owner, repo_name = self.github_service.parse_github_url(repository_url)
-                    analysis = RepositoryAnalysis.objects.create(
-                        repository_url=repository_url,
-                        repository_name=repo_name,
-                        owner=owner,
-                        status='failed',
-                        error_message=error_message
-                    )
-                    return analysis
-                except:
-                    raise Exception(error_message)
+                siblings = structure
+            
+            file_type = type_map.get(entry.get('type'), 'file')
+            file_info = {
+                "name": name,
+                "path": path,
+                "type": file_type,
+                "size": entry.get('size', 0),
+                "download_url": (
+                    f"https://raw.githubusercontent.com/{owner}/{repo_name}/{ref}/{path}"
+                    if file_type == 'file' else None
+                ),
+            }
+            
+            if (file_type == 'dir' and
+                depth < max_depth - 1 and
+                not self._should_skip_directory(name)):
+                file_info["children"] = []
+                directories[path] = file_info
+            
+            siblings.append(file_info)
+        
+        return structure
     
     def _build_file_structure(self, owner: str, repo_name: str, 
                              contents: List[Dict], path: str = "", 
-                             max_depth: int = 3, current_depth: int = 0) -> List[Dict]:
+                             max_depth: int = 3, current_depth: int = 0,
+                             max_requests: int = MAX_DIRECTORY_REQUESTS) -> List[Dict]:
         """
         Build a hierarchical file structure representation
         
+        Directories are walked level by level; all directories of one level
+        are fetched concurrently, so the walk takes one round-trip per level
+        instead of one per directory. At most max_requests directories are
+        listed; directories left unlisted are marked "truncated".
+        
         Args:
             owner: Repository owner
             repo_name: Repository name
@@ -139,6 +365,7 @@ class RepositoryAnalyzerService:
             path: Current path being processed
             max_depth: Maximum depth to traverse
             current_depth: Current traversal depth
+            max_requests: Maximum number of directory listings to request
             
         Returns:
             List of dictionaries representing file structure
@@ -146,42 +373,83 @@ class RepositoryAnalyzerService:
         if current_depth >= max_depth:
             return []
         
+        structure = self._contents_to_nodes(contents)
+        pending = [node for node in structure if self._should_expand(node)]
+        depth = current_depth
+        budget = max_requests
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            while pending and depth < max_depth - 1:
+                if len(pending) > budget:
+                    # Out of requests: keep the nodes but flag them as incomplete
+                    logger.warning("Directory walk budget exhausted, skipping %d directories",
+                                   len(pending) - budget)
+                    for node in pending[budget:]:
+                        node["truncated"] = True
+                    pending = pending[:budget]
+                    if not pending:
+                        break
+                budget -= len(pending)
+                
+                futures = {
+                    executor.submit(
+                        self.github_service.get_repository_contents, owner, repo_name, node['path']
+                    ): node
+                    for node in pending
+                }
+                
+                pending = []
+                for future, node in futures.items():
+                    try:
+                        node["children"] = self._contents_to_nodes(future.result())
+                    except Exception as e:
+                        logger.warning("Failed to get contents for %s: %s", node['path'], e)
+                        node["children"] = []
+                        continue
+                    pending.extend(child for child in node["children"] if self._should_expand(child))
+                
+                depth += 1
+        
+        return structure
+    
+    def _contents_to_nodes(self, contents: List[Dict]) -> List[Dict]:
+        """
+        Convert a GitHub contents listing into file structure nodes
+        
+        Args:
+            contents: List of contents from GitHub API
+            
+        Returns:
+            List of dictionaries representing file structure
+        """
         structure = []
         
         try:
             for item in contents:
-                file_info = {
+                structure.append({
                     "name": item.get('name', ''),
                     "path": item.get('path', ''),
                     "type": item.get('type', 'file'),
                     "size": item.get('size', 0),
                     "download_url": item.get('download_url'),
-                }
-                
-                # If it's a directory and we haven't reached max depth, get its contents
-                if (item.get('type') == 'dir' and 
-                    current_depth < max_depth - 1 and 
-                    not self._should_skip_directory(item.get('name', ''))):
-                    
-                    try:
-                        sub_contents = self.github_service.get_repository_contents(
-                            owner, repo_name, item.get('path', '')
-                        )
-                        file_info["children"] = self._build_file_structure(
-                            owner, repo_name, sub_contents, 
-                            item.get('path', ''), max_depth, current_depth + 1
-                        )
-                    except Exception as e:
-                        logger.warning(f"Failed to get contents for {item.get('path', '')}: {e}")
-                        file_info["children"] = []
-                
-                structure.append(file_info)
-                
+                })
         except Exception as e:
-            logger.error(f"Error building file structure: {e}")
-            
+            logger.error("Error building file structure: %s", e)
+        
         return structure
     
+    def _should_expand(self, node: Dict) -> bool:
+        """
+        Determine if a directory node should be walked into
+        
+        Args:
+            node: File structure node
+            
+        Returns:
+            True if the node is a directory that is not skipped
+        """
+        return node["type"] == 'dir' and not self._should_skip_directory(node["name"])
+    
     def _should_skip_directory(self, dir_name: str) -> bool:
         """
         Determine if a directory should be skipped during traversal
@@ -192,14 +460,7 @@ class RepositoryAnalyzerService:
         Returns:
             True if directory should be skipped
         """
-        skip_dirs = {
-            '.git', '.github', 'node_modules', '__pycache__', '.pytest_cache',
-            'venv', 'env', '.venv', '.env', 'dist', 'build', '.next',
-            'target', 'vendor', '.idea', '.vscode', '.DS_Store',
-            'coverage', '.coverage', '.nyc_output', 'logs', 'log'
-        }
-        
-        return dir_name.lower() in skip_dirs or dir_name.startswith('.')
+        return dir_name.lower() in SKIP_DIRS or dir_name.startswith('.')
     
     def get_analysis_by_url(self, repository_url: str) -> Optional[RepositoryAnalysis]:
         """
@@ -219,7 +480,22 @@ class RepositoryAnalyzerService:
         except Exception:
             return None
     
-    def re_analyze_repository(self, repository_url: str) -> RepositoryAnalysis:
+    def get_in_progress_analysis(self, repository_url: str) -> Optional[RepositoryAnalysis]:
+        """
+        Get the queued or running analysis for a repository URL
+        
+        Args:
+            repository_url: GitHub repository URL
+            
+        Returns:
+            RepositoryAnalysis instance or None if nothing is in progress
+        """
+        return RepositoryAnalysis.objects.filter(
+            repository_url=repository_url,
+            status__in=IN_PROGRESS_STATUSES
+        ).first()
+    
+    def re_analyze_repository(self, repository_url: str) -> Tuple[RepositoryAnalysis, bool]:
         """
         Force re-analysis of a repository (even if already analyzed)
         
@@ -227,13 +503,28 @@ class RepositoryAnalyzerService:
             repository_url: GitHub repository URL
             
         Returns:
-            New RepositoryAnalysis instance
+            Tuple of (analysis, created) as returned by start_analysis; the
+            existing completed analysis with created=False if the repository
+            has not changed since it was analyzed
         """
-        # Delete any existing analysis for this URL
-        RepositoryAnalysis.objects.filter(repository_url=repository_url).delete()
+        existing = self.get_analysis_by_url(repository_url)
+        if existing and existing.tree_sha:
+            try:
+                # ETag-revalidated, so an unchanged tree costs no rate limit
+                repo_tree = self.github_service.get_repository_tree(existing.owner, existing.repository_name)
+                if repo_tree.get('sha') == existing.tree_sha:
+                    logger.info("%s is unchanged since its last analysis", repository_url)
+                    return existing, False
+            except Exception as e:
+                logger.warning("Could not check %s for changes: %s", repository_url, e)
+        
+        # Delete finished analyses for this URL; an in-progress one is joined
+        RepositoryAnalysis.objects.filter(repository_url=repository_url).exclude(
+            status__in=IN_PROGRESS_STATUSES
+        ).delete()
         
-        # Perform fresh analysis
-        return self.analyze_repository(repository_url)
+        # Create a fresh record; the pipeline runs in the worker
+        return self.start_analysis(repository_url)
     
     def get_analysis_summary(self, analysis_id: str) -> Dict:
         """
@@ -274,4 +565,20 @@ class RepositoryAnalyzerService:
             }
             
         except RepositoryAnalysis.DoesNotExist:
-            raise Exception(f"Analysis with ID {analysis_id} not found")
\ No newline at end of file
+            raise Exception(f"Analysis with ID {analysis_id} not found")
+
+
+_repository_analyzer_service = None
+_repository_analyzer_service_lock = threading.Lock()
+
+
+def get_repository_analyzer_service() -> RepositoryAnalyzerService:
+    """Return the shared RepositoryAnalyzerService, creating it on first use"""
+    global _repository_analyzer_service
+    
+    if _repository_analyzer_service is None:
+        with _repository_analyzer_service_lock:
+            if _repository_analyzer_service is None:
+                _repository_analyzer_service = RepositoryAnalyzerService()
+    
+    return _repository_analyzer_service
\ No newline at end of file
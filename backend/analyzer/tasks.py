@@ -0,0 +1,35 @@
+from celery import shared_task
+import logging
+from .models import RepositoryAnalysis
+from .services.repository_analyzer import IN_PROGRESS_STATUSES, get_repository_analyzer_service
+
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def run_analysis(analysis_id: str):
+    """
+    Run the analysis pipeline for an existing RepositoryAnalysis record
+    
+    Args:
+        analysis_id: Analysis UUID
+    """
+    analysis = RepositoryAnalysis.objects.get(id=analysis_id)
+    
+    if analysis.status not in IN_PROGRESS_STATUSES:
+        # Redelivered after the analysis already finished (tasks are acked late)
+        logger.info("Analysis %s is already %s, skipping", analysis_id, analysis.status)
+        return
+    
+    try:
+        analyzer_service = get_repository_analyzer_service()
+    except Exception as e:
+        # Don't leave the record pending forever if the services can't start
+        logger.error("Could not start analysis %s: %s", analysis_id, e)
+        analysis.status = 'failed'
+        analysis.error_message = f"Analysis failed: {str(e)}"
+        analysis.save(update_fields=['status', 'error_message', 'updated_at'])
+        raise
+    
+    analyzer_service.run_analysis(analysis)
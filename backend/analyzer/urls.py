@@ -6,6 +6,7 @@ urlpatterns = [
     path('analyze/', views.analyze_repository, name='analyze_repository'),
     path('re-analyze/', views.re_analyze_repository, name='re_analyze_repository'),
     path('analysis/<uuid:analysis_id>/', views.get_analysis, name='get_analysis'),
+    path('analysis/<uuid:analysis_id>/status/', views.get_analysis_status, name='get_analysis_status'),
     path('analyses/', views.list_analyses, name='list_analyses'),
     
     # Export endpoints
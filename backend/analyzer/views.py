@@ -1,22 +1,81 @@
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django.http import HttpResponse, Http404
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import content_disposition_header
+from django.views.decorators.http import condition
 import os
 import logging
+import zstandard
 from .models import RepositoryAnalysis, ExportFile
 from .serializers import (
     AnalyzeRepositorySerializer,
     RepositoryAnalysisSerializer,
+    RepositoryAnalysisListSerializer,
     ExportFileSerializer
 )
-from .services.repository_analyzer import RepositoryAnalyzerService
-from .services.export_service import ExportService
+from .services.repository_analyzer import get_repository_analyzer_service
+from .services.export_service import get_export_service
+from .tasks import run_analysis
 
 
 logger = logging.getLogger(__name__)
 
+EXPORT_FORMATS = frozenset({'md', 'txt', 'pdf', 'docx'})
+
+
+def _analysis_status_etag(request, analysis_id):
+    """ETag for the status endpoint; changes whenever the row is saved"""
+    row = RepositoryAnalysis.objects.filter(id=analysis_id).values_list('status', 'updated_at').first()
+    if row is None:
+        return None
+    return f"{analysis_id}-{row[0]}-{row[1].timestamp()}"
+
+
+def _accepts_zstd(request):
+    """Whether the client lists zstd in Accept-Encoding"""
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    return 'zstd' in (coding.split(';')[0].strip() for coding in accept_encoding.split(','))
+
+
+def _export_download_etag(export_file, send_zstd):
+    """Tag of one representation; zstd and identity bodies differ byte-wise"""
+    return f"{export_file.file_path}-zstd" if send_zstd else export_file.file_path
+
+
+def _export_etag(request, format_type, analysis_id):
+    """ETag for a download; each regeneration writes a new uniquely named file"""
+    export_file = ExportFile.objects.only('file_path', 'compressed').filter(
+        analysis_id=analysis_id,
+        format=format_type
+    ).first()
+    if export_file is None:
+        return None
+    # No tag (hence no 304) for a file that is gone; the view regenerates it
+    if not os.path.exists(get_export_service().get_export_file_path(export_file)):
+        return None
+    return _export_download_etag(export_file, export_file.compressed and _accepts_zstd(request))
+
+
+def _enqueue_analysis(analysis):
+    """
+    Queue the analysis pipeline for a pending record on the Celery worker
+    
+    Args:
+        analysis: RepositoryAnalysis instance with status 'pending'
+    """
+    try:
+        run_analysis.delay(str(analysis.id))
+    except Exception as e:
+        # Broker unavailable: don't leave the record pending forever
+        analysis.status = 'failed'
+        analysis.error_message = f"Could not queue analysis: {str(e)}"
+        analysis.save(update_fields=['status', 'error_message', 'updated_at'])
+        raise
+
 
 @api_view(['POST'])
 def analyze_repository(request):
@@ -36,23 +95,27 @@ def analyze_repository(request):
     
     try:
         # Check if we have a recent analysis
-        analyzer_service = RepositoryAnalyzerService()
+        analyzer_service = get_repository_analyzer_service()
         existing_analysis = analyzer_service.get_analysis_by_url(repository_url)
         
         if existing_analysis:
-            logger.info(f"Returning existing analysis for {repository_url}")
+            logger.info("Returning existing analysis for %s", repository_url)
             serializer = RepositoryAnalysisSerializer(existing_analysis)
             return Response(serializer.data, status=status.HTTP_200_OK)
         
-        # Perform new analysis
-        logger.info(f"Starting new analysis for {repository_url}")
-        analysis = analyzer_service.analyze_repository(repository_url)
+        # Queue new analysis (or join one already running); the client polls it
+        analysis, created = analyzer_service.start_analysis(repository_url)
+        if created:
+            logger.info("Queueing new analysis for %s", repository_url)
+            _enqueue_analysis(analysis)
+        else:
+            logger.info("Joining in-progress analysis for %s", repository_url)
         
         serializer = RepositoryAnalysisSerializer(analysis)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
         
     except Exception as e:
-        logger.error(f"Analysis failed for {repository_url}: {str(e)}")
+        logger.error("Analysis failed for %s: %s", repository_url, e)
         return Response({
             'error': 'Analysis failed',
             'message': str(e)
@@ -77,6 +140,42 @@ def get_analysis(request, analysis_id):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@condition(etag_func=_analysis_status_etag)
+@api_view(['GET'])
+def get_analysis_status(request, analysis_id):
+    """
+    Lightweight status check for polling a queued analysis
+    
+    GET /api/analysis/{analysis_id}/status/
+    """
+    try:
+        analysis = get_object_or_404(
+            RepositoryAnalysis.objects.only('id', 'status', 'error_message', 'updated_at'),
+            id=analysis_id
+        )
+        response = Response({
+            'id': analysis.id,
+            'status': analysis.status,
+            'error_message': analysis.error_message,
+            'updated_at': analysis.updated_at,
+        })
+        if analysis.status == 'completed':
+            patch_cache_control(response, public=True, max_age=86400)
+        elif analysis.status == 'failed':
+            # A failed row can still be replaced or deleted; revalidate via ETag
+            patch_cache_control(response, no_cache=True)
+        else:
+            patch_cache_control(response, no_store=True)
+        return response
+    except Http404:
+        raise
+    except Exception as e:
+        return Response({
+            'error': 'Failed to retrieve analysis status',
+            'message': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(['POST'])
 def re_analyze_repository(request):
     """
@@ -94,14 +193,19 @@ def re_analyze_repository(request):
     repository_url = serializer.validated_data['repository_url']
     
     try:
-        analyzer_service = RepositoryAnalyzerService()
-        analysis = analyzer_service.re_analyze_repository(repository_url)
+        analyzer_service = get_repository_analyzer_service()
+        analysis, created = analyzer_service.re_analyze_repository(repository_url)
+        if created:
+            _enqueue_analysis(analysis)
         
         serializer = RepositoryAnalysisSerializer(analysis)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        if analysis.status == 'completed':
+            # Repository unchanged: the existing analysis still stands
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
         
     except Exception as e:
-        logger.error(f"Re-analysis failed for {repository_url}: {str(e)}")
+        logger.error("Re-analysis failed for %s: %s", repository_url, e)
         return Response({
             'error': 'Re-analysis failed',
             'message': str(e)
@@ -115,7 +219,7 @@ def export_analysis(request, analysis_id, format_type):
     
     POST /api/export/{format}/{analysis_id}/
     """
-    if format_type not in ['md', 'txt', 'pdf', 'docx']:
+    if format_type not in EXPORT_FORMATS:
         return Response({
             'error': 'Invalid format',
             'message': f'Format must be one of: md, txt, pdf, docx. Got: {format_type}'
@@ -130,20 +234,21 @@ def export_analysis(request, analysis_id, format_type):
                 'message': f'Analysis status is {analysis.status}. Can only export completed analyses.'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        export_service = ExportService()
+        export_service = get_export_service()
         export_file = export_service.export_analysis(analysis, format_type)
         
         serializer = ExportFileSerializer(export_file, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
         
     except Exception as e:
-        logger.error(f"Export failed for analysis {analysis_id} format {format_type}: {str(e)}")
+        logger.error("Export failed for analysis %s format %s: %s", analysis_id, format_type, e)
         return Response({
             'error': 'Export failed',
             'message': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@condition(etag_func=_export_etag)
 @api_view(['GET'])
 def download_export(request, format_type, analysis_id):
     """
@@ -151,25 +256,40 @@ def download_export(request, format_type, analysis_id):
     
     GET /api/download/{format}/{analysis_id}/
     """
+    if format_type not in EXPORT_FORMATS:
+        return Response({
+            'error': 'Invalid format',
+            'message': f'Format must be one of: md, txt, pdf, docx. Got: {format_type}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
     try:
-        analysis = get_object_or_404(RepositoryAnalysis, id=analysis_id)
-        export_file = get_object_or_404(
-            ExportFile, 
-            analysis=analysis, 
+        # Fetch the export together with its analysis in one query
+        export_file = ExportFile.objects.select_related('analysis').filter(
+            analysis_id=analysis_id,
             format=format_type
-        )
+        ).first()
+        if export_file:
+            analysis = export_file.analysis
+        else:
+            analysis = get_object_or_404(RepositoryAnalysis, id=analysis_id)
         
-        export_service = ExportService()
-        file_path = export_service.get_export_file_path(export_file)
+        export_service = get_export_service()
+        file_path = export_service.get_export_file_path(export_file) if export_file else None
         
-        if not os.path.exists(file_path):
-            # File doesn't exist, try to regenerate it
-            logger.warning(f"Export file not found, regenerating: {file_path}")
+        if not file_path or not os.path.exists(file_path):
+            # Exports are generated on first download and reused afterwards
+            if analysis.status != 'completed':
+                return Response({
+                    'error': 'Analysis not completed',
+                    'message': f'Analysis status is {analysis.status}. Can only export completed analyses.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            logger.info("Generating %s export for analysis %s", format_type, analysis_id)
             export_file = export_service.export_analysis(analysis, format_type)
             file_path = export_service.get_export_file_path(export_file)
             
             if not os.path.exists(file_path):
-                raise Http404("Export file not found and could not be regenerated")
+                raise Http404("Export file could not be generated")
         
         # Determine content type
         content_types = {
@@ -184,14 +304,48 @@ def download_export(request, format_type, analysis_id):
         # Generate filename for download
         filename = f"{analysis.repository_name}_{analysis.owner}_analysis.{format_type}"
         
-        # Read and serve file
-        with open(file_path, 'rb') as f:
-            response = HttpResponse(f.read(), content_type=content_type)
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        # Compressed exports go out as-is to clients that accept zstd
+        send_zstd = export_file.compressed and _accepts_zstd(request)
+        
+        if settings.EXPORT_ACCEL_REDIRECT_PREFIX and (send_zstd or not export_file.compressed):
+            # The file goes out byte-for-byte, so let nginx serve it
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = (
+                f"{settings.EXPORT_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{export_file.file_path}"
+            )
+            response['Content-Disposition'] = content_disposition_header(True, filename)
+            if send_zstd:
+                response['Content-Encoding'] = 'zstd'
+                patch_vary_headers(response, ['Accept-Encoding'])
+            response['ETag'] = f'"{_export_download_etag(export_file, send_zstd)}"'
+            patch_cache_control(response, private=True, no_cache=True)
             return response
+        
+        source = open(file_path, 'rb')
+        if export_file.compressed and not send_zstd:
+            source = zstandard.ZstdDecompressor().stream_reader(source)
+        
+        # FileResponse streams the file (via wsgi.file_wrapper when the server
+        # supports it) and sets Content-Length and Content-Disposition
+        response = FileResponse(
+            source,
+            as_attachment=True,
+            filename=filename,
+            content_type=content_type
+        )
+        if send_zstd:
+            response['Content-Encoding'] = 'zstd'
+        elif export_file.compressed:
+            response['Content-Length'] = export_file.file_size
+        if export_file.compressed:
+            patch_vary_headers(response, ['Accept-Encoding'])
+        # Let clients revalidate with If-None-Match instead of downloading again
+        response['ETag'] = f'"{_export_download_etag(export_file, send_zstd)}"'
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
             
     except Exception as e:
-        logger.error(f"Download failed for analysis {analysis_id} format {format_type}: {str(e)}")
+        logger.error("Download failed for analysis %s format %s: %s", analysis_id, format_type, e)
         return Response({
             'error': 'Download failed',
             'message': str(e)
@@ -206,8 +360,11 @@ def list_analyses(request):
     GET /api/analyses/
     """
     try:
-        analyses = RepositoryAnalysis.objects.all().order_by('-created_at')[:50]  # Latest 50
-        serializer = RepositoryAnalysisSerializer(analyses, many=True)
+        # Only load the columns the listing needs; summary/file_structure can be large
+        analyses = RepositoryAnalysis.objects.only(
+            *RepositoryAnalysisListSerializer.Meta.fields
+        ).order_by('-created_at')[:50]  # Latest 50
+        serializer = RepositoryAnalysisListSerializer(analyses, many=True)
         return Response(serializer.data)
     except Exception as e:
         return Response({
@@ -224,8 +381,16 @@ def get_analysis_exports(request, analysis_id):
     GET /api/analysis/{analysis_id}/exports/
     """
     try:
-        analysis = get_object_or_404(RepositoryAnalysis, id=analysis_id)
-        exports = ExportFile.objects.filter(analysis=analysis)
+        # Query the exports directly; the analysis is only looked up to
+        # tell "no exports yet" apart from an unknown analysis
+        exports = list(
+            ExportFile.objects.only('id', 'analysis_id', 'format', 'file_size', 'created_at').filter(
+                analysis_id=analysis_id
+            )
+        )
+        if not exports and not RepositoryAnalysis.objects.filter(id=analysis_id).exists():
+            raise Http404("No RepositoryAnalysis matches the given query.")
+        
         serializer = ExportFileSerializer(exports, many=True, context={'request': request})
         return Response(serializer.data)
     except Exception as e:
@@ -262,6 +427,7 @@ def api_info(request):
         'endpoints': {
             'analyze': '/api/analyze/',
             'get_analysis': '/api/analysis/{id}/',
+            'analysis_status': '/api/analysis/{id}/status/',
             'export': '/api/export/{format}/{id}/',
             'download': '/api/download/{format}/{id}/',
             'list_analyses': '/api/analyses/',
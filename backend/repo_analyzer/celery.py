@@ -0,0 +1,20 @@
+"""
+Celery application for repo_analyzer project.
+
+Long-running repository analyses are executed by Celery workers so that
+API requests return immediately.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'repo_analyzer.settings')
+
+app = Celery('repo_analyzer')
+
+# Read CELERY_* options from Django settings
+app.config_from_object('django.conf:settings', namespace='CELERY')
+
+# Discover tasks.py modules in installed apps
+app.autodiscover_tasks()
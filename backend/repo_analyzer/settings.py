@@ -138,7 +138,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'analyzer.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20
@@ -156,9 +156,49 @@ CORS_ALLOW_CREDENTIALS = True
 GEMINI_API_KEY = config('GEMINI_API_KEY', default='')
 GITHUB_TOKEN = config('GITHUB_TOKEN', default='')
 
+# Seconds a stored Gemini response is reused for an identical prompt
+GEMINI_CACHE_TIMEOUT = config('GEMINI_CACHE_TIMEOUT', default=24 * 60 * 60, cast=int)
+
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
 # Export directory
-EXPORT_ROOT = os.path.join(BASE_DIR, 'exports')
\ No newline at end of file
+EXPORT_ROOT = os.path.join(BASE_DIR, 'exports')
+
+# When set (e.g. '/protected-exports/'), downloads are handed to nginx with
+# X-Accel-Redirect; map that prefix to EXPORT_ROOT in an `internal` location
+EXPORT_ACCEL_REDIRECT_PREFIX = config('EXPORT_ACCEL_REDIRECT_PREFIX', default='')
+
+# Cache settings
+# The 'github' cache stores GitHub API responses with their ETag/Last-Modified
+# validators so repeat analyses can be revalidated with conditional requests.
+GITHUB_CACHE_DIR = config('GITHUB_CACHE_DIR', default=os.path.join(BASE_DIR, 'github_cache'))
+GITHUB_CACHE_TIMEOUT = config('GITHUB_CACHE_TIMEOUT', default=24 * 60 * 60, cast=int)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'github': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': GITHUB_CACHE_DIR,
+        'TIMEOUT': GITHUB_CACHE_TIMEOUT,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+}
+
+# Celery settings
+# Repository analyses run in a Celery worker; set CELERY_TASK_ALWAYS_EAGER=True
+# to run them inline (e.g. for local development without a broker).
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=False, cast=bool)
+CELERY_TASK_IGNORE_RESULT = True
+# Acknowledge only after the analysis finishes so a crashed worker's task is
+# redelivered, and fetch one long-running task at a time per process.
+# Size the concurrency to the Gemini quota.
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_WORKER_CONCURRENCY = config('CELERY_WORKER_CONCURRENCY', default=4, cast=int)
\ No newline at end of file
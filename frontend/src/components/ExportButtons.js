@@ -44,10 +44,7 @@ const ExportButton = ({ analysisId, analysis, format, className = '' }) => {
 
     setIsExporting(true);
     try {
-      // First export the analysis
-      await repositoryApi.exportAnalysis(analysisId, format);
-      
-      // Then download it
+      // The backend generates the file on first download and reuses it afterwards
       const filename = `${analysis?.repository_name || 'analysis'}_${analysis?.owner || 'repo'}_analysis.${config.extension}`;
       await repositoryApi.downloadFile(analysisId, format, filename);
       
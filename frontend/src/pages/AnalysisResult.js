@@ -15,11 +15,13 @@ const AnalysisResult = () => {
 
   useEffect(() => {
     loadAnalysis();
-    
+  }, [analysisId]);
+
+  useEffect(() => {
     // Set up polling for ongoing analysis
     let pollInterval;
-    if (analysis && (analysis.status === 'pending' || analysis.status === 'analyzing')) {
-      pollInterval = setInterval(loadAnalysis, 5000); // Poll every 5 seconds
+    if (!error && analysis && (analysis.status === 'pending' || analysis.status === 'analyzing')) {
+      pollInterval = setInterval(pollStatus, 5000); // Poll every 5 seconds
     }
 
     return () => {
@@ -27,7 +29,7 @@ const AnalysisResult = () => {
         clearInterval(pollInterval);
       }
     };
-  }, [analysisId, analysis?.status]);
+  }, [analysisId, analysis?.status, error]);
 
   const loadAnalysis = async (showLoading = true) => {
     try {
@@ -43,6 +45,22 @@ const AnalysisResult = () => {
     }
   };
 
+  const pollStatus = async () => {
+    try {
+      const { status } = await repositoryApi.getAnalysisStatus(analysisId);
+      // Only fetch the full analysis once the worker has moved it on
+      if (status !== analysis?.status) {
+        await loadAnalysis(false);
+      }
+    } catch (err) {
+      console.error('Failed to poll analysis status:', err);
+      if (err.status === 404) {
+        // The analysis was deleted (e.g. by a re-analysis); stop polling
+        setError('This analysis no longer exists.');
+      }
+    }
+  };
+
   const handleRefresh = async () => {
     setRefreshing(true);
     await loadAnalysis(false);
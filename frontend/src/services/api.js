@@ -93,6 +93,20 @@ class RepositoryApiService {
     }
   }
 
+  /**
+   * Get only the status of an analysis (cheap enough to poll)
+   * @param {string} analysisId - Analysis UUID
+   * @returns {Promise<Object>} Analysis id, status and error message
+   */
+  async getAnalysisStatus(analysisId) {
+    try {
+      const response = await api.get(`/analysis/${analysisId}/status/`);
+      return response.data;
+    } catch (error) {
+      throw this.handleError(error);
+    }
+  }
+
   /**
    * List all analyses
    * @returns {Promise<Array>} List of analyses